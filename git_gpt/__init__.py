@@ -4,7 +4,9 @@ from .issue_command import issue
 from .quality_command import quality
 from .changelog_command import changelog
 from .ask_command import ask
+from .stats_command import stats
+from .report_command import report
 
 __version__ = "0.13.0"
 
-__all__ = ['config', 'commit', 'issue', 'quality', 'changelog', 'ask', '__version__']
+__all__ = ['config', 'commit', 'issue', 'quality', 'changelog', 'ask', 'stats', 'report', '__version__']
@@ -1,15 +1,228 @@
 import json
+import queue
+import threading
+import time
+import click
 from openai import OpenAI, AzureOpenAI
+import openai
+import httpx
 import requests
 import anthropic
 from google import genai
 from google.genai import types # Import types
+from .ledger import record_request
+from .model_router import estimate_tokens
+
+# Default deadline in seconds for a single model request, so that a hung
+# provider cannot block a git hook forever.
+DEFAULT_TIMEOUT = 300
+
+TIMEOUT_ERRORS = (
+    TimeoutError,
+    openai.APITimeoutError,
+    anthropic.APITimeoutError,
+    requests.exceptions.Timeout,
+    httpx.TimeoutException,
+)
+
+def _format_seconds(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+class RequestCancelled(Exception):
+    """Raised by a request that was cancelled with AIClient.cancel_all."""
+
+class RequestDeadline:
+    """Tracks the time left for a request and cancels it when asked."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        self._closers = []
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def remaining(self):
+        """Seconds left before the deadline, or None when there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def register(self, closer):
+        """Registers a callable that aborts the in-flight provider response."""
+        if closer is None:
+            return
+        with self._lock:
+            if not self.cancelled:
+                self._closers.append(closer)
+                return
+        try:
+            closer()
+        except Exception:
+            pass
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            closers, self._closers = self._closers, []
+
+        # Closing a response can block until its reader wakes up, so do it
+        # off the caller's thread.
+        def close_all():
+            for closer in closers:
+                try:
+                    closer()
+                except Exception:
+                    pass
+
+        if closers:
+            threading.Thread(target=close_all, daemon=True).start()
 
 class AIClient:
-    def __init__(self, config):
+    def __init__(self, config, verbose=False):
         self.config = config
+        self.verbose = verbose
+        # Provider clients are pooled per endpoint and key so that connections
+        # opened by warm_up are reused by the request that follows.
+        self._clients = {}
+        # Clients that a request closes on cancellation are lent out instead of shared
+        self._idle_clients = {}
+        self._clients_lock = threading.Lock()
+        self._warm_ups = {}
+        # Deadlines of in-flight requests, so that cancel_all can abort them
+        self._deadlines = set()
+        self._deadlines_lock = threading.Lock()
+        self._cancelled = False
+
+    def _client_key(self, model_config):
+        return (model_config.get('provider'), model_config.get('api_base'), model_config.get('key'))
+
+    def _pooled_client(self, model_config, factory):
+        key = self._client_key(model_config)
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = factory()
+            return self._clients[key]
+
+    def _borrow_client(self, model_config, factory):
+        """Takes an idle client for the endpoint out of the pool, or makes a new one."""
+        with self._clients_lock:
+            idle = self._idle_clients.get(self._client_key(model_config))
+            if idle:
+                return idle.pop()
+        return factory()
+
+    def _return_client(self, model_config, client):
+        with self._clients_lock:
+            self._idle_clients.setdefault(self._client_key(model_config), []).append(client)
+
+    def warm_up(self, model_alias, timeout=None):
+        """
+        Starts connecting to the provider of a model alias in a background
+        thread, so that connection setup and, for Ollama, model loading overlap
+        with computing the diff. Failures are ignored; the request will report them.
+
+        Args:
+            model_alias: The alias to warm up, ignored when None.
+            timeout: The command's --timeout, which also bounds the warm-up.
+        """
+        model_config = self.config.get('models', {}).get(model_alias) if model_alias else None
+        if not model_config or model_alias in self._warm_ups:
+            return
+
+        state = {'started_at': time.monotonic(), 'finished_at': None, 'error': None}
+
+        def run():
+            try:
+                self._warm_up_provider(model_config, timeout)
+            except Exception as e:
+                state['error'] = e
+            finally:
+                state['finished_at'] = time.monotonic()
+
+        state['thread'] = threading.Thread(target=run, daemon=True)
+        self._warm_ups[model_alias] = state
+        state['thread'].start()
+
+    def _warm_up_provider(self, model_config, timeout=None):
+        provider = model_config.get('provider')
+        timeout = self._resolve_timeout(timeout, model_config) or None
+        if provider == 'openai':
+            self._openai_client(model_config).models.list(timeout=timeout)
+        elif provider == 'azure-openai':
+            self._azure_openai_client(model_config).models.list(timeout=timeout)
+        elif provider == 'ollama':
+            # A generate request without a prompt loads the model and keeps it in memory
+            response = self._ollama_session(model_config).post(
+                self._ollama_api_base(model_config) + '/api/generate',
+                json={"model": model_config['model_name'], "keep_alive": model_config.get('keep_alive', '5m')},
+                timeout=timeout)
+            response.raise_for_status()
+        elif provider == 'claude':
+            self._claude_client(model_config).models.list(limit=1, timeout=timeout)
+        elif provider == 'google-generativeai':
+            http_options = types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None
+            client = self._borrow_client(model_config, lambda: self._google_generativeai_client(model_config))
+            client.models.get(model=model_config['model_name'], config=types.GetModelConfig(http_options=http_options))
+            self._return_client(model_config, client)
+
+    def _finish_warm_up(self, model_alias, deadline):
+        """
+        Waits for a pending warm-up of the alias, at most until the request's
+        deadline, and reports how much of it overlapped.
+        """
+        state = self._warm_ups.pop(model_alias, None)
+        if not state:
+            return
+        requested_at = time.monotonic()
+        while state['thread'].is_alive() and not deadline.cancelled:
+            remaining = deadline.remaining()
+            if remaining == 0:
+                break
+            # Wait in short steps so that cancellation is noticed
+            state['thread'].join(0.1 if remaining is None else min(0.1, remaining))
+        if deadline.cancelled:
+            raise RequestCancelled(f"Request to model '{model_alias}' was cancelled")
+        if not self.verbose:
+            return
+        if state['thread'].is_alive():
+            click.echo(f"Warm-up of '{model_alias}' has not finished after {time.monotonic() - state['started_at']:.2f}s, sending the request anyway")
+            return
+        if state['error']:
+            click.echo(f"Warm-up of '{model_alias}' failed: {state['error']}")
+            return
+        duration = state['finished_at'] - state['started_at']
+        overlapped = min(state['finished_at'], requested_at) - state['started_at']
+        click.echo(f"Warm-up of '{model_alias}' took {duration:.2f}s, {overlapped:.2f}s of it overlapped with preparing the diff")
+
+    def cancel_all(self):
+        """
+        Cancels every in-flight request and makes later requests fail, so that
+        Ctrl-C in a command running requests in worker threads does not have
+        to wait for their deadlines.
+        """
+        with self._deadlines_lock:
+            self._cancelled = True
+            deadlines = list(self._deadlines)
+        for deadline in deadlines:
+            deadline.cancel()
+
+    def remaining_time(self, model_alias, timeout, started_at):
+        """
+        Seconds left of the deadline of a request to model_alias that started
+        at started_at (a time.monotonic() value), or None when it has none.
+        """
+        deadline = self._resolve_timeout(timeout, self.config.get('models', {}).get(model_alias) or {})
+        if not deadline:
+            return None
+        return max(0.0, deadline - (time.monotonic() - started_at))
+
+    def _resolve_timeout(self, timeout, model_config):
+        for value in (timeout, model_config.get('timeout'), self.config.get('timeout')):
+            if value is not None:
+                return value
+        return DEFAULT_TIMEOUT
 
-    def request(self, messages, model_alias=None, max_tokens=None):
+    def request(self, messages, model_alias=None, max_tokens=None, timeout=None, command=None, diff_bytes=None, allow_partial=True):
         if not model_alias:
             model_alias = self.config.get('default_model')
             if not model_alias:
@@ -24,22 +237,155 @@ class AIClient:
         if not provider:
             raise ValueError(f"Provider not specified for model alias '{model_alias}'")
 
-        print(f"Requesting content from model '{model_alias}' using provider '{provider}'")
+        # Created before waiting for the warm-up, so that the wait counts against it
+        deadline = RequestDeadline(self._resolve_timeout(timeout, model_config))
+        with self._deadlines_lock:
+            if self._cancelled:
+                raise RequestCancelled(f"Request to model '{model_alias}' was cancelled")
+            self._deadlines.add(deadline)
+        # Filled in by the provider with reported token usage, and by _collect with timings
+        metrics = {}
+        started_at = time.monotonic()
+        content = None
+        error_class = None
 
-        if provider == 'openai':
-            return self._openai_request(messages, model_config, max_tokens)
-        elif provider == 'azure-openai':
-            return self._azure_openai_request(messages, model_config, max_tokens)
-        elif provider == 'ollama':
-            return self._ollama_request(messages, model_config, max_tokens)
-        elif provider == 'claude':
-            return self._claude_request(messages, model_config, max_tokens)
-        elif provider == 'google-generativeai':
-            return self._google_generativeai_request(messages, model_config, max_tokens)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        try:
+            self._finish_warm_up(model_alias, deadline)
+            click.echo(f"Requesting content from model '{model_alias}' using provider '{provider}'")
+
+            if provider == 'openai':
+                stream = self._openai_request(messages, model_config, max_tokens, deadline, metrics)
+            elif provider == 'azure-openai':
+                stream = self._azure_openai_request(messages, model_config, max_tokens, deadline, metrics)
+            elif provider == 'ollama':
+                stream = self._ollama_request(messages, model_config, max_tokens, deadline, metrics)
+            elif provider == 'claude':
+                stream = self._claude_request(messages, model_config, max_tokens, deadline, metrics)
+            elif provider == 'google-generativeai':
+                stream = self._google_generativeai_request(messages, model_config, max_tokens, deadline, metrics)
+            else:
+                raise ValueError(f"Unsupported provider: {provider}")
 
-    def _openai_request(self, messages, model_config, max_tokens):
+            content = self._collect(stream, deadline, model_alias, metrics, allow_partial, started_at)
+            if metrics.get('timed_out'):
+                error_class = 'TimeoutError'
+            return content
+        except BaseException as e:
+            error_class = type(e).__name__
+            raise
+        finally:
+            with self._deadlines_lock:
+                self._deadlines.discard(deadline)
+            if self.config.get('ledger', True):
+                self._record(metrics, started_at, messages, content, error_class,
+                             command=command, alias=model_alias, provider=provider, diff_bytes=diff_bytes)
+
+    def _record(self, metrics, started_at, messages, content, error_class, **entry):
+        """Writes the request to the ledger, estimating tokens the provider did not report."""
+        prompt_tokens = metrics.get('prompt_tokens')
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(msg['content']) for msg in messages)
+        completion_tokens = metrics.get('completion_tokens')
+        if completion_tokens is None and content is not None:
+            completion_tokens = estimate_tokens(content)
+        cached_tokens = metrics.get('cached_tokens')
+        record_request(dict(
+            entry,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            cache_hit=None if cached_tokens is None else int(cached_tokens > 0),
+            ttft=metrics.get('ttft'),
+            latency=time.monotonic() - started_at,
+            error_class=error_class,
+        ))
+
+    def _collect(self, stream, deadline, model_alias, metrics, allow_partial=True, started_at=None):
+        """
+        Drains a provider stream in a worker thread while the caller waits on
+        the deadline, so that expiry and Ctrl-C are honoured even while the
+        provider is silent. On expiry the partial output is returned, or a
+        TimeoutError raised when allow_partial is False.
+
+        The time to first token is measured from started_at, the start of the
+        request including any warm-up wait, so that latency minus ttft is the
+        generation time alone.
+        """
+        chunks = queue.Queue()
+        started_at = started_at or time.monotonic()
+
+        def pump():
+            try:
+                for chunk in stream:
+                    if deadline.cancelled:
+                        break
+                    chunks.put(('chunk', chunk))
+                chunks.put(('done', None))
+            except BaseException as e:
+                chunks.put(('error', e))
+
+        # Wakes the wait below when the request is cancelled from another thread
+        deadline.register(lambda: chunks.put(('cancelled', None)))
+        threading.Thread(target=pump, daemon=True).start()
+
+        parts = []
+        try:
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=deadline.remaining())
+                except queue.Empty:
+                    break
+                if kind == 'chunk':
+                    if not parts:
+                        metrics['ttft'] = time.monotonic() - started_at
+                    parts.append(value)
+                elif kind == 'done':
+                    return ''.join(parts).strip()
+                elif kind == 'cancelled':
+                    raise RequestCancelled(f"Request to model '{model_alias}' was cancelled")
+                elif isinstance(value, TIMEOUT_ERRORS):
+                    break
+                else:
+                    raise value
+        except KeyboardInterrupt:
+            deadline.cancel()
+            click.echo("Request cancelled.")
+            raise
+
+        deadline.cancel()
+        metrics['timed_out'] = True
+        partial = ''.join(parts).strip()
+        if not partial:
+            raise TimeoutError(f"Model '{model_alias}' did not respond within {_format_seconds(deadline.timeout)} seconds")
+        if not allow_partial:
+            raise TimeoutError(f"Model '{model_alias}' did not finish within {_format_seconds(deadline.timeout)} seconds")
+        click.echo(f"Warning: model '{model_alias}' hit the {_format_seconds(deadline.timeout)} second deadline, returning partial output")
+        return partial
+
+    def _chat_completions_stream(self, client, messages, model_config, max_tokens, deadline, metrics, include_usage=True):
+        request_args = {
+            "model": model_config['model_name'],
+            "messages": messages,
+            "stream": True,
+            "max_tokens": max_tokens,
+            "timeout": deadline.remaining(),
+        }
+        if include_usage:
+            # The usage arrives in a last chunk without choices
+            request_args["stream_options"] = {"include_usage": True}
+        stream = client.chat.completions.create(**request_args)
+        deadline.register(stream.close)
+        for chunk in stream:
+            if chunk.usage:
+                metrics['prompt_tokens'] = chunk.usage.prompt_tokens
+                metrics['completion_tokens'] = chunk.usage.completion_tokens
+                details = chunk.usage.prompt_tokens_details
+                if details is not None and details.cached_tokens is not None:
+                    metrics['cached_tokens'] = details.cached_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _openai_client(self, model_config):
         if 'key' not in model_config or not model_config['key']:
             raise ValueError("API key not provided for OpenAI")
 
@@ -47,15 +393,14 @@ class AIClient:
         if not api_base:
             api_base = 'https://api.openai.com/v1'
 
-        openAIClient = OpenAI(api_key=model_config['key'], base_url=api_base)
-        response = openAIClient.chat.completions.create(
-                model=model_config['model_name'],
-                messages=messages,
-                stream=False,
-                max_tokens=max_tokens)
-        return response.choices[0].message.content
+        return self._pooled_client(model_config, lambda: OpenAI(api_key=model_config['key'], base_url=api_base))
 
-    def _azure_openai_request(self, messages, model_config, max_tokens):
+    def _openai_request(self, messages, model_config, max_tokens, deadline, metrics):
+        openAIClient = self._openai_client(model_config)
+        return self._chat_completions_stream(openAIClient, messages, model_config, max_tokens, deadline, metrics,
+                                             include_usage=model_config.get('stream_usage', True))
+
+    def _azure_openai_client(self, model_config):
         if 'key' not in model_config or not model_config['key']:
             raise ValueError("API key not provided for Azure OpenAI")
 
@@ -65,25 +410,29 @@ class AIClient:
         if 'model_name' not in model_config or not model_config['model_name']:
             raise ValueError("Azure deployment name not provided for Azure OpenAI, please set it as 'model_name' in the configuration")
 
-        azureOpenAIClient = AzureOpenAI(
+        return self._pooled_client(model_config, lambda: AzureOpenAI(
             api_key=model_config['key'],
             api_version="2023-07-01-preview",
             azure_endpoint=model_config['api_base']
-        )
+        ))
 
-        response = azureOpenAIClient.chat.completions.create(
-            model=model_config['model_name'],
-            messages=messages,
-            stream=False,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
+    def _azure_openai_request(self, messages, model_config, max_tokens, deadline, metrics):
+        azureOpenAIClient = self._azure_openai_client(model_config)
+        # The API version used here predates stream_options, so usage is opt-in for Azure
+        return self._chat_completions_stream(azureOpenAIClient, messages, model_config, max_tokens, deadline, metrics,
+                                             include_usage=model_config.get('stream_usage', False))
 
-    def _ollama_request(self, messages, model_config, max_tokens):
+    def _ollama_api_base(self, model_config):
         api_base = model_config.get('api_base', 'http://localhost:11434')
         if not api_base:
             api_base = 'http://localhost:11434'
-        api_base += '/api/chat'
+        return api_base
+
+    def _ollama_session(self, model_config):
+        return self._pooled_client(model_config, requests.Session)
+
+    def _ollama_request(self, messages, model_config, max_tokens, deadline, metrics):
+        api_base = self._ollama_api_base(model_config) + '/api/chat'
 
         request_data = {
             "model": model_config['model_name'],
@@ -92,52 +441,74 @@ class AIClient:
         if max_tokens:
             request_data["options"] = {"num_predict": max_tokens}
 
+        response = None
         try:
-            response = requests.post(api_base, json=request_data)
+            response = self._ollama_session(model_config).post(api_base, json=request_data, stream=True, timeout=deadline.remaining())
+            deadline.register(response.close)
             response.raise_for_status()
-            content = response.content.decode('utf-8')
-            full_response = ""
-            for line in content.strip().split('\n'):
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line:
+                    continue
                 try:
                     json_obj = json.loads(line)
                     if 'message' in json_obj and 'content' in json_obj['message']:
-                        full_response += json_obj['message']['content']
+                        yield json_obj['message']['content']
                     if json_obj.get('done', False):
+                        metrics['prompt_tokens'] = json_obj.get('prompt_eval_count')
+                        metrics['completion_tokens'] = json_obj.get('eval_count')
                         break
                 except json.JSONDecodeError:
-                    print(f"Error decoding JSON line: {line}")
+                    click.echo(f"Error decoding JSON line: {line}")
                     continue
-            return full_response.strip()
 
         except requests.exceptions.RequestException as e:
-            print(f"Error in Ollama API request: {e}")
-            if response is not None:
-                print(f"Response content: {response.content}")
+            click.echo(f"Error in Ollama API request: {e}")
+            if response is not None and not deadline.cancelled:
+                click.echo(f"Response content: {response.content}")
             raise
 
-    def _claude_request(self, messages, model_config, max_tokens):
+    def _claude_client(self, model_config):
         if 'key' not in model_config or not model_config['key']:
             raise ValueError("API key not provided for Claude")
 
-        client = anthropic.Anthropic(api_key=model_config['key'])
+        return self._pooled_client(model_config, lambda: anthropic.Anthropic(api_key=model_config['key']))
 
-        # Convert messages to Anthropic's format
-        anthropic_messages = [{"role": msg["role"], "content": msg["content"]} for msg in messages]
+    def _claude_request(self, messages, model_config, max_tokens, deadline, metrics):
+        client = self._claude_client(model_config)
 
-        response = client.messages.create(
-            model=model_config['model_name'],
-            max_tokens=max_tokens or model_config.get('max_tokens', 1024),
-            messages=anthropic_messages
-        )
-        return response.content
+        # Convert messages to Anthropic's format, which takes the system prompt separately
+        request_args = {
+            "model": model_config['model_name'],
+            "max_tokens": max_tokens or model_config.get('max_tokens', 1024),
+            "messages": [{"role": msg["role"], "content": msg["content"]} for msg in messages if msg["role"] != "system"],
+            "timeout": deadline.remaining(),
+        }
+        system_prompts = [msg["content"] for msg in messages if msg["role"] == "system"]
+        if system_prompts:
+            request_args["system"] = "\n".join(system_prompts)
 
-    def _google_generativeai_request(self, messages, model_config, max_tokens):
+        with client.messages.stream(**request_args) as stream:
+            deadline.register(stream.close)
+            for text in stream.text_stream:
+                yield text
+            usage = stream.get_final_message().usage
+            metrics['prompt_tokens'] = usage.input_tokens
+            metrics['completion_tokens'] = usage.output_tokens
+            metrics['cached_tokens'] = usage.cache_read_input_tokens
+
+    def _google_generativeai_client(self, model_config):
         if 'key' not in model_config or not model_config['key']:
             raise ValueError("API key not provided for Google Generative AI")
 
-        # Keep the original client instantiation
-        client = genai.Client(api_key=model_config['key'])
+        return genai.Client(api_key=model_config['key'])
+
+    def _google_generativeai_request(self, messages, model_config, max_tokens, deadline, metrics):
+        # The SDK stream cannot be closed from another thread, so the request
+        # borrows a client of its own that cancellation can close.
+        client = self._borrow_client(model_config, lambda: self._google_generativeai_client(model_config))
+        deadline.register(client.close)
         model_name = model_config['model_name']
+        remaining = deadline.remaining()
 
         system_instruction = None
         chat_messages_parts = []
@@ -156,6 +527,8 @@ class AIClient:
         config_dict = {
             'max_output_tokens': max_tokens or None,
             'system_instruction': system_instruction or None,
+            # The SDK takes its timeout in milliseconds
+            'http_options': types.HttpOptions(timeout=int(remaining * 1000)) if remaining else None,
             # Add other config parameters from model_config if needed, e.g.:
             # 'top_k': model_config.get('top_k'),
             # 'top_p': model_config.get('top_p'),
@@ -168,11 +541,17 @@ class AIClient:
         # Create GenerateContentConfig object
         generation_config = types.GenerateContentConfig(**config_dict)
 
-        # Use the generate_content call with the config object
-        response = client.models.generate_content(
+        # Stream the response so a deadline can keep what was generated so far
+        for chunk in client.models.generate_content_stream(
             model=model_name,
             contents=prompt,
             config=generation_config # Pass the config object here
-        )
-        # Keep the original return statement
-        return response.text
+        ):
+            if chunk.usage_metadata:
+                metrics['prompt_tokens'] = chunk.usage_metadata.prompt_token_count
+                metrics['completion_tokens'] = chunk.usage_metadata.candidates_token_count
+                metrics['cached_tokens'] = chunk.usage_metadata.cached_content_token_count
+            if chunk.text:
+                yield chunk.text
+        if not deadline.cancelled:
+            self._return_client(model_config, client)
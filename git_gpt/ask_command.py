@@ -3,7 +3,9 @@ import git
 from .config_command import get_config
 import os
 from .ai_client import AIClient
-from .git_diff import get_git_diff_by_commit_range
+from .git_diff import get_diff
+from .diff_pipeline import prepare_diff
+from .model_router import select_model, predict_model
 
 ask_prompt = """
 ```diff
@@ -15,17 +17,19 @@ ask_prompt = """
 @click.command()
 @click.option('--model', '-m', default=None, help='The model to use for generating the answer.')
 @click.option('--commit-range', '-r', type=int, help='The number of commits to include in the diff.')
+@click.option('--diff-file', type=click.Path(exists=True, dir_okay=False, allow_dash=True), default=None, help='Read the diff from a patch file, or - for stdin, instead of running git.')
+@click.option('--timeout', type=float, default=None, help='Deadline in seconds for the model request (0 disables it).')
+@click.option('--verbose', '-v', is_flag=True, help='Print details such as the model route that was chosen.')
 @click.option('--question', '-q', help='The question to ask.', required=True)
-def ask(model, commit_range, question):
+def ask(model, commit_range, diff_file, question, timeout, verbose):
     config = get_config()
-    model = model or config.get('default_model')
 
-    if not model:
-        raise ValueError("No default model specified in configuration. Please run git-gpt set-default to set default model or run git-gpt config to add model configuration.")
+    # Connect to the provider while git computes the diff
+    ai_client = AIClient(config, verbose=verbose)
+    ai_client.warm_up(predict_model(config, 'ask', model), timeout=timeout)
 
-    diff = get_git_diff_by_commit_range(commit_range)
-
-    ai_client = AIClient(config)
+    diff = prepare_diff(get_diff(commit_range, diff_file), config)
+    model = select_model(config, 'ask', diff, model, verbose)
 
     try:
         click.echo(f"Generating answer using {model}...")
@@ -37,7 +41,8 @@ def ask(model, commit_range, question):
             {"role": "user", "content": prompt}
         ]
 
-        response = ai_client.request(messages=messages, model_alias=model)
+        response = ai_client.request(messages=messages, model_alias=model, timeout=timeout,
+                                     command='ask', diff_bytes=len(diff.encode('utf-8')))
         ask_result = response
         click.echo(f"Answer generated successfully:\n\n{ask_result}")
     except ValueError as e:
@@ -1,10 +1,14 @@
 from datetime import datetime
+import time
 import click
 import git
 from .config_command import get_config
 import os
 from .ai_client import AIClient
-from .git_diff import get_git_diff_by_commit_range
+from .git_diff import get_diff
+from .diff_pipeline import prepare_diff
+from .output_validation import finalize_output
+from .model_router import select_model, predict_model
 
 system_instruction = "You are going to work as a text generator, **you don't talk at all**, you will print your response in plain text without code block."
 
@@ -52,37 +56,45 @@ and this project adheres to [Semantic Versioning](https://semver.org/spec/v2.0.0
 ```md
 """
 
+def build_changelog_messages(diff, lang):
+    """Builds the chat messages that ask for a changelog of the diff."""
+    prompt = changelog_prompt.replace('[insert_diff]', diff).replace('[insert_language]', lang).replace('[insert_date]', datetime.now().strftime('%Y-%m-%d'))
+    return [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": prompt}
+    ]
+
 @click.command()
 @click.option('--lang', '-l', default=None, help='Target language for the generated changelog.')
 @click.option('--model', '-m', default=None, help='The model to use for generating the changelog.')
 @click.option('--max-tokens', '-t', type=int, help='The maximum number of tokens to use for the changelog.')
 @click.option('--commit-range', '-r', type=int, help='The number of commits to include in the diff.')
-def changelog(lang, model, max_tokens, commit_range):
+@click.option('--diff-file', type=click.Path(exists=True, dir_okay=False, allow_dash=True), default=None, help='Read the diff from a patch file, or - for stdin, instead of running git.')
+@click.option('--timeout', type=float, default=None, help='Deadline in seconds for the model request (0 disables it).')
+@click.option('--verbose', '-v', is_flag=True, help='Print details such as the model route that was chosen.')
+def changelog(lang, model, max_tokens, commit_range, diff_file, timeout, verbose):
     config = get_config()
 
     lang = lang or config.get('lang', 'English')
-    model = model or config.get('default_model')
 
-    if not model:
-        raise ValueError("No default model specified in configuration. Please run git-gpt set-default to set default model or run git-gpt config to add model configuration.")
+    # Connect to the provider while git computes the diff
+    ai_client = AIClient(config, verbose=verbose)
+    ai_client.warm_up(predict_model(config, 'changelog', model), timeout=timeout)
 
-    diff = get_git_diff_by_commit_range(commit_range)
+    diff = prepare_diff(get_diff(commit_range, diff_file), config)
+    model = select_model(config, 'changelog', diff, model, verbose)
 
     max_tokens = max_tokens or config.get('changelog_max_tokens') or None
 
-    ai_client = AIClient(config)
-
     try:
         click.echo(f"Generating changelog using {model} in {lang}...")
 
-        prompt = changelog_prompt.replace('[insert_diff]', diff).replace('[insert_language]', lang).replace('[insert_date]', datetime.now().strftime('%Y-%m-%d'))
-
-        messages = [
-            {"role": "system", "content": system_instruction},
-            {"role": "user", "content": prompt}
-        ]
+        messages = build_changelog_messages(diff, lang)
 
-        response = ai_client.request(messages=messages, model_alias=model, max_tokens=max_tokens)
+        started_at = time.monotonic()
+        response = ai_client.request(messages=messages, model_alias=model, max_tokens=max_tokens, timeout=timeout,
+                                     command='changelog', diff_bytes=len(diff.encode('utf-8')))
+        response = finalize_output('changelog', response, ai_client, model, timeout, config.get('repair_output', True), lang, started_at)
         changelog_result = response
         click.echo(f"Changelog generated successfully:\n\n{changelog_result}")
     except ValueError as e:
@@ -1,9 +1,15 @@
 import subprocess
 import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import click
-import git
 from .config_command import get_config
 from .ai_client import AIClient
+from .model_router import select_model, predict_model
+from .diff_pipeline import prepare_diff
+from .git_diff import read_diff_file, get_staged_diff
+from .output_validation import finalize_output
+from .workspace import find_repositories, superprojects_of, commit_order
 import os
 
 system_instruction = "You are going to work as a text generator, **you don't talk at all**, you will print your response in plain text without code block."
@@ -46,39 +52,163 @@ Security(If applicable):
 ```
 """
 
+def build_commit_messages(diff, lang):
+    prompt = commit_message_prompt.replace('[insert_diff]', diff).replace('[insert_language]', lang)
+    return [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": prompt}
+    ]
+
+def submodule_update_message(children):
+    """A commit message for a superproject whose only change is new submodule commits."""
+    return "chore: update submodules\n\n" + '\n'.join(f"- {child}" for child in children)
+
+def commit_workspace(config, lang, model, run_dry, timeout, verbose, worktrees=False, jobs=None):
+    """
+    Generates commit messages for every repository of a workspace that has
+    changes, asks for one confirmation for the whole batch and commits
+    submodules before the superprojects that record them.
+
+    Diffs are computed in worker processes and messages are generated with at
+    most jobs (or 'workspace_concurrency', default 4) requests in flight.
+    """
+    root = os.getcwd()
+    repositories = find_repositories(root, submodules=True, worktrees=worktrees)
+    names = {path: os.path.relpath(path, root) for path in repositories}
+    names = {path: os.path.basename(path) if name == '.' else name for path, name in names.items()}
+
+    click.echo(f"Staging changes in {len(repositories)} repositories...")
+    with ProcessPoolExecutor(max_workers=min(len(repositories), os.cpu_count() or 1)) as executor:
+        futures = {path: executor.submit(get_staged_diff, path) for path in repositories}
+        # Start the warm-up thread only once the worker processes have been forked
+        ai_client = AIClient(config, verbose=verbose)
+        ai_client.warm_up(predict_model(config, 'commit', model), timeout=timeout)
+        diffs = {}
+        for path, future in futures.items():
+            try:
+                diff = future.result()
+            except Exception as e:
+                click.echo(f"Error staging changes in {names[path]}: {str(e)}")
+                continue
+            if diff.strip():
+                diffs[path] = diff
+
+    if not diffs:
+        click.echo("No changes to commit in the workspace.")
+        return
+
+    def generate(path):
+        diff = prepare_diff(diffs[path], config)
+        alias = select_model(config, 'commit', diff, model, verbose)
+        click.echo(f"Generating commit message for {names[path]} with {alias} in {lang}...")
+        started_at = time.monotonic()
+        response = ai_client.request(messages=build_commit_messages(diff, lang), model_alias=alias, timeout=timeout,
+                                     command='commit', diff_bytes=len(diff.encode('utf-8')))
+        return finalize_output('commit', response, ai_client, alias, timeout, config.get('repair_output', True), lang, started_at)
+
+    commit_messages = {}
+    executor = ThreadPoolExecutor(max_workers=jobs or config.get('workspace_concurrency', 4))
+    futures = {path: executor.submit(generate, path) for path in diffs}
+    try:
+        for path, future in futures.items():
+            try:
+                message = future.result()
+            except Exception as e:
+                click.echo(f"Error generating commit message for {names[path]}: {str(e)}")
+                continue
+            if message:
+                commit_messages[path] = message
+    except KeyboardInterrupt:
+        # Abort the requests still running instead of waiting for their deadlines
+        ai_client.cancel_all()
+        executor.shutdown(wait=False, cancel_futures=True)
+        click.echo("Cancelled. Nothing was committed; the changes stay staged.")
+        raise
+    executor.shutdown()
+
+    # Superprojects without changes of their own still have to record the new submodule commits
+    for path in list(commit_messages):
+        for superproject in superprojects_of(path, repositories):
+            if superproject not in diffs:
+                commit_messages.setdefault(superproject, None)
+    children = {path: [os.path.relpath(child, path) for child in commit_messages if repositories[child] == path]
+                for path in commit_messages}
+    for path, message in commit_messages.items():
+        if message is None:
+            commit_messages[path] = submodule_update_message(children[path])
+
+    order = commit_order(list(commit_messages), repositories)
+    for path in order:
+        click.echo(f"\n{'=' * 20} {names[path]} {'=' * 20}\n\n{commit_messages[path]}")
+
+    if run_dry or not order:
+        return
+    if not click.confirm(f"\nCommit {len(order)} repositories with these messages?", default=False):
+        click.echo("Aborted. The changes stay staged.")
+        return
+
+    for path in order:
+        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_file:
+            temp_file.write(commit_messages[path])
+            temp_file_name = temp_file.name
+        try:
+            if children[path]:
+                # Stage the submodule commits created above
+                subprocess.run(['git', 'add', '--', *children[path]], cwd=path, check=True)
+            subprocess.run(['git', 'commit', '-F', temp_file_name], cwd=path, check=True)
+            click.echo(f"Committed {names[path]}.")
+        except subprocess.CalledProcessError:
+            click.echo(f"Failed to commit {names[path]}. Aborting the remaining commits.")
+            return
+        finally:
+            os.remove(temp_file_name)
+    click.echo("Please run `git commit --amend` in a repository to edit its commit message if needed.")
+
 @click.command()
 @click.option('--lang', '-l', default=None, help='Target language for the generated message.')
 @click.option('--model', '-m', default=None, help='The model to use for generating the commit message.')
 @click.option('--run-dry', '-d', is_flag=True, help='Run the command to print the commit message without actually committing.')
-def commit(lang, model, run_dry):
+@click.option('--diff-file', type=click.Path(exists=True, dir_okay=False, allow_dash=True), default=None, help='Read the diff from a patch file, or - for stdin, instead of running git. Requires --run-dry.')
+@click.option('--timeout', type=float, default=None, help='Deadline in seconds for the model request (0 disables it).')
+@click.option('--verbose', '-v', is_flag=True, help='Print details such as the model route that was chosen.')
+@click.option('--recurse-submodules', is_flag=True, help='Also commit changes in submodules, recursively, before the superproject.')
+@click.option('--workspace', is_flag=True, help='Like --recurse-submodules, and also include the other worktrees of the repository.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None, help='Maximum number of concurrent model requests in workspace mode.')
+def commit(lang, model, run_dry, diff_file, timeout, verbose, recurse_submodules, workspace, jobs):
+    if diff_file and not run_dry:
+        raise click.UsageError("--diff-file can only be used with --run-dry, since there is no staged change to commit.")
+    if diff_file and (recurse_submodules or workspace):
+        raise click.UsageError("--diff-file cannot be combined with --recurse-submodules or --workspace.")
+
     config = get_config()
 
     # If arguments are not provided via command line, try to get them from the config file
     lang = lang or config.get('lang', 'English')
-    model = model or config.get('default_model')
 
-    if not model:
-        raise ValueError("No default model specified in configuration. Please run git-gpt set-default to set default model or run git-gpt config to add model configuration.")
+    if recurse_submodules or workspace:
+        commit_workspace(config, lang, model, run_dry, timeout, verbose, worktrees=workspace, jobs=jobs)
+        return
 
-    repo = git.Repo(os.getcwd())
-    # add all changes to staged
-    repo.git.add('--all')
-    diff = repo.git.diff('--staged')  # Get textual representation of staged diffs
-    click.echo('Run Command: git diff --staged')
+    # Connect to the provider while git computes the diff
+    ai_client = AIClient(config, verbose=verbose)
+    ai_client.warm_up(predict_model(config, 'commit', model), timeout=timeout)
 
-    ai_client = AIClient(config)
+    if diff_file:
+        diff = read_diff_file(diff_file)
+    else:
+        # add all changes to staged and get textual representation of staged diffs
+        diff = get_staged_diff(os.getcwd())
+        click.echo('Run Command: git diff --staged')
+    diff = prepare_diff(diff, config)
+    model = select_model(config, 'commit', diff, model, verbose)
 
     try:
         click.echo(f"Generating commit message with {model} in {lang}...")
 
-        prompt = commit_message_prompt.replace('[insert_diff]', diff).replace('[insert_language]', lang)
-
-        messages = [
-            {"role": "system", "content": system_instruction},
-            {"role": "user", "content": prompt}
-        ]
-
-        response = ai_client.request(messages=messages, model_alias=model)
+        started_at = time.monotonic()
+        response = ai_client.request(messages=build_commit_messages(diff, lang), model_alias=model, timeout=timeout,
+                                     command='commit', diff_bytes=len(diff.encode('utf-8')))
+        response = finalize_output('commit', response, ai_client, model, timeout, config.get('repair_output', True), lang, started_at)
         commit_message = response
 
         if run_dry:
@@ -0,0 +1,76 @@
+import re
+from .git_diff import parse_diff, render_diff, diff_file_path
+
+IDENTIFIER_PLACEHOLDER = '<id>'
+
+def normalize_hunk(hunk, ignore_patterns=()):
+    """
+    Builds the key used to group hunks. Only added and removed lines are
+    compared, since line numbers and context differ from file to file even
+    when the change is the same. Trailing whitespace is ignored and any text
+    matching ignore_patterns is replaced with a placeholder so that hunks that
+    only differ by file-specific identifiers group together.
+    """
+    lines = []
+    for line in hunk[1:]:
+        if not line.startswith(('+', '-')):
+            continue
+        line = line.rstrip()
+        for pattern in ignore_patterns:
+            line = pattern.sub(IDENTIFIER_PLACEHOLDER, line)
+        lines.append(line)
+    return '\n'.join(lines)
+
+def dedup_hunks(diff, ignore_patterns=None):
+    """
+    Replaces repeated hunks with a single representative hunk followed by a
+    note listing the other files it appears in.
+
+    Args:
+        diff: The diff to deduplicate.
+        ignore_patterns: Regular expressions for identifiers to ignore when
+            comparing hunks.
+
+    Returns:
+        A tuple of the deduplicated diff and the number of hunks removed.
+    """
+    patterns = [re.compile(pattern) for pattern in ignore_patterns or []]
+    preamble, files = parse_diff(diff)
+
+    groups = {}
+    for file_index, section in enumerate(files):
+        for hunk_index, hunk in enumerate(section['hunks']):
+            key = normalize_hunk(hunk, patterns)
+            if key:
+                groups.setdefault(key, []).append((file_index, hunk_index))
+
+    removed = set()
+    notes = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        representative, duplicates = members[0], members[1:]
+        removed.update(duplicates)
+        paths = list(dict.fromkeys(diff_file_path(files[file_index]) for file_index, _ in duplicates))
+        notes[representative] = (
+            f"# git-gpt: the change in the hunk above is repeated {len(duplicates)} more time(s) "
+            f"({len(members)} in total) in: {', '.join(paths)}"
+        )
+
+    if not removed:
+        return diff, 0
+
+    deduplicated = []
+    for file_index, section in enumerate(files):
+        hunks = []
+        for hunk_index, hunk in enumerate(section['hunks']):
+            if (file_index, hunk_index) in removed:
+                continue
+            note = notes.get((file_index, hunk_index))
+            hunks.append(hunk + [note] if note else hunk)
+        # Files whose every hunk was a repeat are fully described by the notes
+        if section['hunks'] and not hunks:
+            continue
+        deduplicated.append({'header': section['header'], 'hunks': hunks})
+
+    return render_diff(preamble, deduplicated), len(removed)
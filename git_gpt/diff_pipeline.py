@@ -0,0 +1,36 @@
+import click
+from .diff_dedup import dedup_hunks
+from .diff_summarizers import summarize_files, SUMMARIZERS
+from .model_router import estimate_tokens
+
+def prepare_diff(diff, config):
+    """
+    Runs the local stages that shrink a diff before it is put in a prompt.
+
+    Stages can be turned off in the configuration:
+        summarize_files: Replace lockfiles and generated files with facts
+            from a local summarizer (default true).
+        summarize_patterns: Extra {glob pattern: summarizer name} mappings.
+        dedup_hunks: Collapse repeated hunks into one representative (default true).
+        dedup_ignore_patterns: Regular expressions for file-specific identifiers
+            to ignore when comparing hunks.
+
+    Returns:
+        The diff to send to the model.
+    """
+    if config.get('summarize_files', True):
+        extra_patterns = config.get('summarize_patterns') or {}
+        for pattern, name in extra_patterns.items():
+            if name not in SUMMARIZERS:
+                click.echo(f"Warning: unknown summarizer '{name}' for pattern '{pattern}', choose from {', '.join(SUMMARIZERS)}")
+        before = estimate_tokens(diff)
+        diff, summarized = summarize_files(diff, extra_patterns)
+        if summarized:
+            click.echo(f"Summarized {summarized} lockfile(s) or generated file(s) locally, saving ~{before - estimate_tokens(diff)} tokens")
+
+    if config.get('dedup_hunks', True):
+        before = estimate_tokens(diff)
+        diff, removed = dedup_hunks(diff, config.get('dedup_ignore_patterns'))
+        if removed:
+            click.echo(f"Deduplicated {removed} repeated hunk(s), saving ~{before - estimate_tokens(diff)} tokens")
+    return diff
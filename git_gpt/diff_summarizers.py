@@ -0,0 +1,210 @@
+import fnmatch
+import posixpath
+import re
+from .git_diff import parse_diff, render_diff, diff_file_path
+
+# Summarizer name -> function taking a parse_diff file section and returning
+# a list of fact lines, or None to leave the section untouched.
+SUMMARIZERS = {}
+
+# (file pattern, summarizer name), checked in order. Extra patterns can be
+# added with the 'summarize_patterns' configuration key.
+SUMMARIZER_PATTERNS = []
+
+# Header comments that mark a file as generated even when its name does not
+GENERATED_MARKER_RE = re.compile(
+    r'[ +]\s*(?://|#|/?\*|--)\s*(?:Code generated .*DO NOT EDIT|Generated by the protocol buffer compiler'
+    r'|@generated|.*auto generated by OpenAPI Generator)')
+HUNK_NEW_START_RE = re.compile(r'@@ -\d+(?:,\d+)? \+(\d+)')
+# How far into the file a generated marker may appear
+GENERATED_MARKER_LINES = 10
+
+# Maximum number of packages or symbols listed per fact
+MAX_LISTED = 15
+
+def register_summarizer(name, patterns=()):
+    """
+    Registers a local summarizer for files matching the given glob patterns.
+    Patterns without a '/' are matched against the file name, others against
+    the whole path.
+    """
+    def decorator(func):
+        SUMMARIZERS[name] = func
+        SUMMARIZER_PATTERNS.extend((pattern, name) for pattern in patterns)
+        return func
+    return decorator
+
+def _matches(path, pattern):
+    target = path if '/' in pattern else posixpath.basename(path)
+    return fnmatch.fnmatch(target, pattern)
+
+def find_summarizer(section, extra_patterns=None):
+    """Returns the name of the summarizer for a file section, if any."""
+    path = diff_file_path(section)
+    for pattern, name in list((extra_patterns or {}).items()) + SUMMARIZER_PATTERNS:
+        if _matches(path, pattern):
+            return name
+    first_hunk = section['hunks'][0] if section['hunks'] else None
+    start = HUNK_NEW_START_RE.match(first_hunk[0]) if first_hunk else None
+    if start and int(start.group(1)) <= 1:
+        for line in first_hunk[1:GENERATED_MARKER_LINES + 1]:
+            if GENERATED_MARKER_RE.match(line):
+                return 'generated'
+    return None
+
+def _list(items):
+    items = list(items)
+    listed = ', '.join(items[:MAX_LISTED])
+    if len(items) > MAX_LISTED:
+        listed += f' and {len(items) - MAX_LISTED} more'
+    return listed
+
+def _line_counts(section):
+    added = removed = 0
+    for hunk in section['hunks']:
+        for line in hunk[1:]:
+            if line.startswith('+'):
+                added += 1
+            elif line.startswith('-'):
+                removed += 1
+    return added, removed
+
+def _version_facts(old, new):
+    """Describes packages that were bumped, added or removed between two {name: version} maps."""
+    bumped = [f"{name} {old[name]}→{new[name]}" for name in old if name in new and old[name] != new[name]]
+    added = [f"{name} {new[name]}" for name in new if name not in old]
+    removed = [f"{name} {old[name]}" for name in old if name not in new]
+    facts = []
+    if bumped:
+        facts.append(f"bumped {len(bumped)} package(s): {_list(bumped)}")
+    if added:
+        facts.append(f"added {len(added)} package(s): {_list(added)}")
+    if removed:
+        facts.append(f"removed {len(removed)} package(s): {_list(removed)}")
+    return facts
+
+def _track_versions(section, name_re, version_re, reset_re=None):
+    """
+    Walks the hunks of a lockfile in which a package name line is followed by
+    its version line, following the old ('-') and new ('+') side of the file
+    separately. Only packages with changed lines are reported.
+
+    Returns:
+        A tuple of ({name: old version}, {name: new version}).
+    """
+    versions = {'-': {}, '+': {}}
+    touched = set()
+    for hunk in section['hunks']:
+        current = {'-': None, '+': None}
+        for line in hunk[1:]:
+            sign, text = line[:1], line[1:]
+            if not sign or sign not in ' -+':
+                continue
+            sides = '-+' if sign == ' ' else sign
+            if reset_re and reset_re.match(text):
+                for side in sides:
+                    current[side] = None
+                continue
+            name_match = name_re.match(text)
+            if name_match:
+                for side in sides:
+                    current[side] = name_match.group(1)
+            else:
+                version_match = version_re.match(text)
+                if version_match:
+                    for side in sides:
+                        if current[side]:
+                            versions[side][current[side]] = version_match.group(1)
+            if sign != ' ' and current[sign]:
+                touched.add(current[sign])
+    old = {name: version for name, version in versions['-'].items() if name in touched}
+    new = {name: version for name, version in versions['+'].items() if name in touched}
+    return old, new
+
+NPM_NESTED_KEYS = {'dependencies', 'devDependencies', 'peerDependencies', 'optionalDependencies',
+                   'peerDependenciesMeta', 'requires', 'engines', 'bin', 'funding', 'packages', 'license'}
+NPM_NAME_RE = re.compile(r'\s*"(?:[^"]*node_modules/)?([^"]+)": \{\s*$')
+NPM_VERSION_RE = re.compile(r'\s*"version": "([^"]+)"')
+
+@register_summarizer('npm-lock', ['package-lock.json', 'npm-shrinkwrap.json'])
+def summarize_npm_lock(section):
+    old, new = _track_versions(section, NPM_NAME_RE, NPM_VERSION_RE)
+    old = {name: version for name, version in old.items() if name not in NPM_NESTED_KEYS}
+    new = {name: version for name, version in new.items() if name not in NPM_NESTED_KEYS}
+    return _version_facts(old, new)
+
+TOML_NAME_RE = re.compile(r'name = "([^"]+)"')
+TOML_VERSION_RE = re.compile(r'version = "([^"]+)"')
+TOML_RESET_RE = re.compile(r'\[\[package\]\]')
+
+@register_summarizer('toml-lock', ['poetry.lock', 'Cargo.lock', 'uv.lock'])
+def summarize_toml_lock(section):
+    return _version_facts(*_track_versions(section, TOML_NAME_RE, TOML_VERSION_RE, TOML_RESET_RE))
+
+YARN_NAME_RE = re.compile(r'"?(@?[^@\s"]+)@[^:]*:\s*$')
+YARN_VERSION_RE = re.compile(r'\s+version:? "?([^"\s]+)"?')
+
+@register_summarizer('yarn-lock', ['yarn.lock'])
+def summarize_yarn_lock(section):
+    return _version_facts(*_track_versions(section, YARN_NAME_RE, YARN_VERSION_RE))
+
+@register_summarizer('go-sum', ['go.sum'])
+def summarize_go_sum(section):
+    versions = {'-': {}, '+': {}}
+    for hunk in section['hunks']:
+        for line in hunk[1:]:
+            fields = line[1:].split()
+            if line[:1] in ('-', '+') and len(fields) == 3:
+                module, version = fields[0], fields[1].replace('/go.mod', '')
+                versions[line[:1]][module] = version
+    return _version_facts(versions['-'], versions['+'])
+
+SYMBOL_RE = re.compile(r'[+-]\s*(?:def|class|func|message|service|enum|interface|type|struct)\s+(\w+)')
+
+@register_summarizer('generated', ['*_pb2.py', '*_pb2_grpc.py', '*_pb2.pyi', '*.pb.go', '*.pb.cc', '*.pb.h', '*.pb.ts'])
+def summarize_generated(section):
+    added, removed = _line_counts(section)
+    facts = [f"regenerated: +{added}/-{removed} lines in {len(section['hunks'])} hunk(s)"]
+    symbols = []
+    for hunk in section['hunks']:
+        for line in hunk[1:]:
+            match = SYMBOL_RE.match(line)
+            if match and match.group(1) not in symbols:
+                symbols.append(match.group(1))
+    if symbols:
+        facts.append(f"touched definitions: {_list(symbols)}")
+    return facts
+
+def summarize_files(diff, extra_patterns=None):
+    """
+    Replaces the hunks of lockfiles and generated files with compact facts
+    produced by the matching local summarizer.
+
+    Args:
+        diff: The diff to summarize.
+        extra_patterns: A {glob pattern: summarizer name} dict checked before
+            the built-in patterns.
+
+    Returns:
+        A tuple of the new diff and the number of files summarized.
+    """
+    preamble, files = parse_diff(diff)
+    summarized = 0
+    for section in files:
+        if not section['hunks']:
+            continue
+        name = find_summarizer(section, extra_patterns)
+        summarizer = SUMMARIZERS.get(name)
+        if not summarizer:
+            continue
+        facts = summarizer(section)
+        if facts is None:
+            continue
+        added, removed = _line_counts(section)
+        facts = facts or [f"+{added}/-{removed} lines with no package changes recognized"]
+        section['hunks'] = [[f"# git-gpt summary of {name} (+{added}/-{removed} lines omitted):"] + [f"# {fact}" for fact in facts]]
+        summarized += 1
+
+    if not summarized:
+        return diff, 0
+    return render_diff(preamble, files), summarized
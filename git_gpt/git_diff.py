@@ -1,5 +1,7 @@
 import git
+import mmap
 import os
+import sys
 import click
 
 def get_git_diff_by_commit_range(commit_range: int | None = None) -> str:
@@ -18,3 +20,97 @@ def get_git_diff_by_commit_range(commit_range: int | None = None) -> str:
     click.echo(f"Running git command: {diff_command}")
     diff = repo.git.diff(f'HEAD~{effective_commit_range}..HEAD')
     return diff
+
+def get_staged_diff(repo_path: str) -> str:
+    """
+    Stages all changes of a repository and returns the staged diff.
+
+    Does not print anything, so that it can run in a worker process.
+
+    Args:
+        repo_path: The working tree of the repository.
+
+    Returns:
+        The staged diff as a string.
+    """
+    repo = git.Repo(repo_path)
+    repo.git.add('--all')
+    return repo.git.diff('--staged')
+
+def read_diff_file(path: str) -> str:
+    """
+    Reads a precomputed patch, so that commands can run without a git checkout.
+
+    Regular files are memory-mapped and decoded straight from the mapping,
+    without first reading them into an intermediate bytes buffer.
+
+    Args:
+        path: The patch file, or '-' to read from stdin.
+
+    Returns:
+        The patch as a string.
+    """
+    if path == '-':
+        click.echo("Reading diff from stdin")
+        return sys.stdin.buffer.read().decode('utf-8', errors='replace')
+
+    click.echo(f"Reading diff from {path}")
+    with open(path, 'rb') as patch_file:
+        try:
+            with mmap.mmap(patch_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, 'utf-8', 'replace')
+        except (ValueError, OSError):
+            # Empty files and pipes (e.g. process substitution) cannot be mapped
+            return patch_file.read().decode('utf-8', errors='replace')
+
+def get_diff(commit_range: int | None = None, diff_file: str | None = None) -> str:
+    """Returns the diff from diff_file when given, otherwise from the commit range."""
+    if diff_file:
+        return read_diff_file(diff_file)
+    return get_git_diff_by_commit_range(commit_range)
+
+def parse_diff(diff: str) -> tuple[list[str], list[dict]]:
+    """
+    Splits a unified diff into per-file sections.
+
+    Args:
+        diff: The diff as produced by `git diff`.
+
+    Returns:
+        The lines before the first file, and a list of file sections, each a
+        dict with 'header' (a list of lines up to the first hunk) and 'hunks'
+        (a list of hunks, each a list of lines starting with its '@@' line).
+    """
+    preamble, files = [], []
+    current = None
+    for line in diff.split('\n'):
+        if line.startswith('diff --git '):
+            current = {'header': [line], 'hunks': []}
+            files.append(current)
+        elif current is None:
+            preamble.append(line)
+        elif line.startswith('@@'):
+            current['hunks'].append([line])
+        elif current['hunks']:
+            current['hunks'][-1].append(line)
+        else:
+            current['header'].append(line)
+    return preamble, files
+
+def render_diff(preamble: list[str], files: list[dict]) -> str:
+    """Joins the output of parse_diff back into a diff."""
+    lines = list(preamble)
+    for section in files:
+        lines.extend(section['header'])
+        for hunk in section['hunks']:
+            lines.extend(hunk)
+    return '\n'.join(lines)
+
+def diff_file_path(section: dict) -> str:
+    """Returns the path of the file a section of parse_diff describes."""
+    for prefix in ('+++ b/', '--- a/'):
+        for line in section['header']:
+            if line.startswith(prefix):
+                return line[len(prefix):]
+    # New, deleted or binary files without ---/+++ lines: 'diff --git a/x b/x'
+    return section['header'][0].split(' b/', 1)[-1]
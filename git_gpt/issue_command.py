@@ -1,9 +1,13 @@
+import time
 import click
 import git
 from .config_command import get_config
 import os
 from .ai_client import AIClient
-from .git_diff import get_git_diff_by_commit_range
+from .git_diff import get_diff
+from .diff_pipeline import prepare_diff
+from .output_validation import finalize_output
+from .model_router import select_model, predict_model
 
 system_instruction = "You are going to work as a text generator, **you don't talk at all**, you will print your response in plain text without code block."
 
@@ -61,37 +65,45 @@ Issue template:
 
 """
 
+def build_issue_messages(diff, lang):
+    """Builds the chat messages that ask for an issue describing the diff."""
+    prompt = issue_prompt.replace('[insert_diff]', diff).replace('[insert_language]', lang)
+    return [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": prompt}
+    ]
+
 @click.command()
 @click.option('--lang', '-l', default=None, help='Target language for the generated message.')
 @click.option('--model', '-m', default=None, help='The model to use for generating the commit message.')
 @click.option('--max-tokens', '-t', type=int, help='The maximum number of tokens to use for the issue prompt.')
 @click.option('--commit-range', '-r', type=int, help='The number of commits to include in the diff.')
-def issue(lang, model, max_tokens, commit_range):
+@click.option('--diff-file', type=click.Path(exists=True, dir_okay=False, allow_dash=True), default=None, help='Read the diff from a patch file, or - for stdin, instead of running git.')
+@click.option('--timeout', type=float, default=None, help='Deadline in seconds for the model request (0 disables it).')
+@click.option('--verbose', '-v', is_flag=True, help='Print details such as the model route that was chosen.')
+def issue(lang, model, max_tokens, commit_range, diff_file, timeout, verbose):
     config = get_config()
 
     lang = lang or config.get('lang', 'English')
-    model = model or config.get('default_model')
 
-    if not model:
-        raise ValueError("No default model specified in configuration. Please run git-gpt set-default to set default model or run git-gpt config to add model configuration.")
+    # Connect to the provider while git computes the diff
+    ai_client = AIClient(config, verbose=verbose)
+    ai_client.warm_up(predict_model(config, 'issue', model), timeout=timeout)
 
-    diff = get_git_diff_by_commit_range(commit_range)
+    diff = prepare_diff(get_diff(commit_range, diff_file), config)
+    model = select_model(config, 'issue', diff, model, verbose)
 
     max_tokens = max_tokens or config.get('issue_max_tokens') or None
 
-    ai_client = AIClient(config)
-
     try:
         click.echo(f"Generating issue using {model} in {lang}...")
 
-        prompt = issue_prompt.replace('[insert_diff]', diff).replace('[insert_language]', lang)
-
-        messages = [
-            {"role": "system", "content": system_instruction},
-            {"role": "user", "content": prompt}
-        ]
+        messages = build_issue_messages(diff, lang)
 
-        response = ai_client.request(messages=messages, model_alias=model, max_tokens=max_tokens)
+        started_at = time.monotonic()
+        response = ai_client.request(messages=messages, model_alias=model, max_tokens=max_tokens, timeout=timeout,
+                                     command='issue', diff_bytes=len(diff.encode('utf-8')))
+        response = finalize_output('issue', response, ai_client, model, timeout, config.get('repair_output', True), lang, started_at)
         issue_content = response
         click.echo(f"Issue generated successfully:\n\n{issue_content}")
     except ValueError as e:
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import time
+import click
+from .config_command import CONFIG_PATH
+
+LEDGER_PATH = os.path.join(os.path.dirname(CONFIG_PATH), 'ledger.db')
+
+LEDGER_COLUMNS = [
+    ('created_at', 'REAL NOT NULL'),
+    ('command', 'TEXT'),
+    ('alias', 'TEXT'),
+    ('provider', 'TEXT'),
+    ('diff_bytes', 'INTEGER'),
+    ('prompt_tokens', 'INTEGER'),
+    ('completion_tokens', 'INTEGER'),
+    ('cached_tokens', 'INTEGER'),
+    ('cache_hit', 'INTEGER'),
+    ('ttft', 'REAL'),
+    ('latency', 'REAL'),
+    ('error_class', 'TEXT'),
+]
+
+def _connect(path=None):
+    path = path or LEDGER_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5)
+    columns = ', '.join(f'{name} {kind}' for name, kind in LEDGER_COLUMNS)
+    connection.execute(f'CREATE TABLE IF NOT EXISTS requests (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})')
+    connection.execute('CREATE INDEX IF NOT EXISTS requests_created_at ON requests (created_at)')
+    return connection
+
+def record_request(entry, path=None):
+    """
+    Appends one request to the ledger. Failures are reported but never
+    interrupt the command that made the request.
+
+    Args:
+        entry: A dict keyed by the names in LEDGER_COLUMNS.
+        path: The ledger database, defaults to LEDGER_PATH.
+    """
+    entry = dict(entry, created_at=entry.get('created_at') or time.time())
+    names = [name for name, _ in LEDGER_COLUMNS]
+    connection = None
+    try:
+        connection = _connect(path)
+        with connection:
+            connection.execute(
+                f"INSERT INTO requests ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+                [entry.get(name) for name in names])
+    except (sqlite3.Error, OSError) as e:
+        click.echo(f"Warning: could not write to request ledger: {e}")
+    finally:
+        if connection is not None:
+            connection.close()
+
+def load_requests(since=None, provider=None, command=None, path=None):
+    """
+    Reads ledger rows as dicts, optionally filtered by time, provider and command.
+
+    Args:
+        since: Only return rows recorded at or after this UNIX timestamp.
+    """
+    clauses, params = [], []
+    if since is not None:
+        clauses.append('created_at >= ?')
+        params.append(since)
+    if provider:
+        clauses.append('provider = ?')
+        params.append(provider)
+    if command:
+        clauses.append('command = ?')
+        params.append(command)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    connection = _connect(path)
+    try:
+        connection.row_factory = sqlite3.Row
+        rows = connection.execute(f'SELECT * FROM requests {where} ORDER BY created_at', params).fetchall()
+    finally:
+        connection.close()
+    return [dict(row) for row in rows]
@@ -6,6 +6,8 @@ from git_gpt.issue_command import issue
 from git_gpt.quality_command import quality
 from git_gpt.changelog_command import changelog
 from git_gpt.ask_command import ask
+from git_gpt.stats_command import stats
+from git_gpt.report_command import report
 
 default_model = 'gpt-4o-mini'
 
@@ -20,6 +22,8 @@ cli.add_command(issue)
 cli.add_command(quality)
 cli.add_command(changelog)
 cli.add_command(ask)
+cli.add_command(stats)
+cli.add_command(report)
 
 @cli.command()
 @click.option('-a', '--alias', help='Model alias to set as default')
@@ -0,0 +1,105 @@
+import click
+
+# Rough heuristic used across git-gpt: about four characters per token.
+CHARS_PER_TOKEN = 4
+
+no_model_message = "No default model specified in configuration. Please run git-gpt set-default to set default model or run git-gpt config to add model configuration."
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def diff_stats(diff):
+    """
+    Measures a diff for routing purposes.
+
+    Returns:
+        A dict with 'diff_bytes', 'files' and 'tokens'.
+    """
+    diff = diff or ""
+    files = sum(1 for line in diff.splitlines() if line.startswith('diff --git '))
+    return {
+        'diff_bytes': len(diff.encode('utf-8')),
+        'files': files,
+        'tokens': estimate_tokens(diff),
+    }
+
+def _rule_matches(rule, command, stats):
+    commands = rule.get('commands')
+    if commands and command not in commands:
+        return False
+    for metric in ('diff_bytes', 'files', 'tokens'):
+        minimum = rule.get(f'min_{metric}')
+        maximum = rule.get(f'max_{metric}')
+        if minimum is not None and stats[metric] < minimum:
+            return False
+        if maximum is not None and stats[metric] > maximum:
+            return False
+    return True
+
+def _describe_rule(rule):
+    conditions = []
+    if rule.get('commands'):
+        conditions.append(f"commands={','.join(rule['commands'])}")
+    for metric in ('diff_bytes', 'files', 'tokens'):
+        if rule.get(f'min_{metric}') is not None:
+            conditions.append(f"{metric}>={rule[f'min_{metric}']}")
+        if rule.get(f'max_{metric}') is not None:
+            conditions.append(f"{metric}<={rule[f'max_{metric}']}")
+    return ' and '.join(conditions) or 'always'
+
+def select_model(config, command, diff, model=None, verbose=False):
+    """
+    Picks the model alias for a command.
+
+    An explicit model always wins. Otherwise the 'routes' list in the
+    configuration is evaluated in order and the first rule whose conditions
+    match the diff is used, falling back to 'default_model'.
+
+    Args:
+        config: The loaded configuration.
+        command: The name of the command making the request, e.g. 'commit'.
+        diff: The diff that will be sent to the model.
+        model: The alias passed on the command line, if any.
+        verbose: Whether to explain the chosen route.
+
+    Returns:
+        The selected model alias.
+    """
+    stats = diff_stats(diff)
+    measured = f"{stats['diff_bytes']} bytes, {stats['files']} files, ~{stats['tokens']} tokens"
+
+    if model:
+        if verbose:
+            click.echo(f"Route: using '{model}' from --model ({measured})")
+        return model
+
+    for index, rule in enumerate(config.get('routes', [])):
+        if not rule.get('model'):
+            continue
+        if _rule_matches(rule, command, stats):
+            if verbose:
+                click.echo(f"Route: using '{rule['model']}' from route #{index + 1} ({_describe_rule(rule)}) for {measured}")
+            return rule['model']
+
+    model = config.get('default_model')
+    if not model:
+        raise ValueError(no_model_message)
+    if verbose:
+        click.echo(f"Route: using default model '{model}' for {measured}")
+    return model
+
+def predict_model(config, command, model=None):
+    """
+    Returns the alias a command will use when it is known before the diff is
+    computed, i.e. when --model is given or no route applies to the command.
+    Returns None when the choice depends on the diff.
+    """
+    if model:
+        return model
+    for rule in config.get('routes', []):
+        if rule.get('model') and (not rule.get('commands') or command in rule['commands']):
+            return None
+    return config.get('default_model') or None
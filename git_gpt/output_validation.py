@@ -0,0 +1,263 @@
+import re
+import textwrap
+import click
+
+COMMIT_TITLE_LIMIT = 50
+COMMIT_BODY_LIMIT = 70
+
+COMMIT_TYPES = ['feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'build', 'ci', 'chore', 'revert', 'security', 'deps']
+CONVENTIONAL_HEADER_RE = re.compile(r'^(' + '|'.join(COMMIT_TYPES) + r')(\([^)]*\))?(!)?:\s*(\S.*)$', re.IGNORECASE)
+FENCE_RE = re.compile(r'^\s*```[\w-]*\s*$')
+BULLET_RE = re.compile(r'^(\s*)[*+•]\s+')
+TASK_RE = re.compile(r'^(\s*)-\s*\[\s*([xX ]?)\s*\]\s*')
+PLACEHOLDER_BULLET_RE = re.compile(r'^\s*-\s*(?:\[ \]\s*)?\[[^\]]*\]\s*$')
+IF_APPLICABLE_RE = re.compile(r'\s*\(If applicable\)', re.IGNORECASE)
+BOLD_HEADING_RE = re.compile(r'^\s*\*\*([^*]+?)\*\*:?\s*$')
+COMMIT_HEADING_RE = re.compile(r'^(?:[-*+•]\s+)?\**\s*([^:*]+?)\s*\**\s*:\s*\**$')
+
+CHANGELOG_SECTIONS = ['Added', 'Changed', 'Deprecated', 'Removed', 'Fixed', 'Security']
+
+repair_system_instruction = "You are going to work as a text generator, **you don't talk at all**, you will print your response in plain text without code block."
+
+repair_prompt = """The following [insert_kind] does not follow the required format.
+
+Problems:
+[insert_problems]
+
+Rewrite it so that these problems are fixed. Keep its meaning and language, and print only the corrected text.
+
+[insert_output]
+"""
+
+def strip_code_fences(text):
+    """Removes code fence lines that wrap the whole output."""
+    lines = text.strip().split('\n')
+    while lines and FENCE_RE.match(lines[0]):
+        lines.pop(0)
+    while lines and FENCE_RE.match(lines[-1]):
+        lines.pop()
+    return '\n'.join(lines).strip()
+
+def normalize_bullets(lines):
+    """Uses '-' for every list item and '- [ ]' for every task."""
+    normalized = []
+    for line in lines:
+        line = BULLET_RE.sub(r'\1- ', line)
+        task = TASK_RE.match(line)
+        if task:
+            mark = 'x' if task.group(2).lower() == 'x' else ' '
+            line = f"{task.group(1)}- [{mark}] {line[task.end():]}"
+        normalized.append(line.rstrip())
+    return normalized
+
+def drop_placeholders(lines):
+    """Removes list items that were copied verbatim from a template, e.g. '- [List new features.]'."""
+    return [line for line in lines if not PLACEHOLDER_BULLET_RE.match(line)]
+
+def drop_empty_sections(lines, is_heading):
+    """Removes template placeholder items and optional sections left without content."""
+    lines = drop_placeholders(lines)
+    kept = []
+    for index, line in enumerate(lines):
+        if is_heading(line):
+            following = next((next_line for next_line in lines[index + 1:] if next_line.strip()), None)
+            if following is None or is_heading(following):
+                continue
+        kept.append(line)
+    return collapse_blank_lines(kept)
+
+def collapse_blank_lines(lines):
+    collapsed = []
+    for line in lines:
+        if not line.strip() and collapsed and not collapsed[-1].strip():
+            continue
+        collapsed.append(line)
+    return collapsed
+
+def wrap_line(line, width):
+    """Wraps a line, indenting continuation lines of list items."""
+    if len(line) <= width:
+        return [line]
+    bullet = re.match(r'^(\s*-\s(?:\[[x ]\]\s)?)', line)
+    indent = ' ' * len(bullet.group(1)) if bullet else ''
+    return textwrap.wrap(line, width=width, subsequent_indent=indent, break_long_words=False, break_on_hyphens=False) or [line]
+
+def commit_heading(line):
+    """
+    Returns the section name when a commit body line is a heading such as
+    'Added:', '**Fixed:**' or '* Changed(If applicable):', otherwise None.
+    List items ending in a colon only count when they name a known section.
+    """
+    text = IF_APPLICABLE_RE.sub('', line).strip()
+    match = COMMIT_HEADING_RE.match(text)
+    if not match:
+        return None
+    if re.match(r'[-*+•]\s', text) and match.group(1).capitalize() not in CHANGELOG_SECTIONS:
+        return None
+    return match.group(1)
+
+def fix_commit_message(text, lang=None):
+    """
+    Repairs a commit message locally.
+
+    Returns:
+        A tuple of the repaired message and the problems that remain.
+    """
+    lines = strip_code_fences(text).split('\n')
+
+    # Drop any chatter before the conventional commit header
+    start = next((index for index, line in enumerate(lines) if CONVENTIONAL_HEADER_RE.match(line.strip(' `*'))), None)
+    if start is None:
+        return '\n'.join(lines).strip(), ["the first line is not a conventional commit header such as 'feat: <title>'"]
+    header_match = CONVENTIONAL_HEADER_RE.match(lines[start].strip(' `*'))
+    type_, scope, breaking, title = header_match.groups()
+    title = title.strip().rstrip('.')
+    header = f"{type_.lower()}{scope or ''}{breaking or ''}: {title}"
+
+    # Headings are detected before bullets are normalized, so that '* Added:' stays a heading
+    body = [f"{commit_heading(line)}:" if commit_heading(line) else line for line in lines[start + 1:]]
+    body = normalize_bullets(body)
+    body = [IF_APPLICABLE_RE.sub('', line) for line in body]
+    body = drop_empty_sections(body, lambda line: commit_heading(line) is not None)
+    wrapped = []
+    for line in body:
+        wrapped.extend(wrap_line(line, COMMIT_BODY_LIMIT))
+    while wrapped and not wrapped[0].strip():
+        wrapped.pop(0)
+
+    message = header + ('\n\n' + '\n'.join(wrapped).strip() if wrapped else '')
+    problems = []
+    if len(title) > COMMIT_TITLE_LIMIT:
+        problems.append(f"the title after '{type_.lower()}{scope or ''}: ' is {len(title)} characters, it must be under {COMMIT_TITLE_LIMIT}")
+    return message, problems
+
+def _is_markdown_heading(line):
+    return line.startswith('#')
+
+def is_english(lang):
+    return not lang or lang.strip().lower() in ('english', 'en') or lang.strip().lower().startswith('en-')
+
+def fix_changelog(text, lang=None):
+    """
+    Repairs a Keep a Changelog entry locally. Section names are only checked
+    for English output, since the prompt asks for the target language.
+    """
+    lines = normalize_bullets(strip_code_fences(text).split('\n'))
+    fixed = []
+    problems = []
+    for line in lines:
+        line = IF_APPLICABLE_RE.sub('', line)
+        section = re.match(r'^#{2,4}\s+(\w+)\s*:?\s*$', line)
+        if section and section.group(1).capitalize() in CHANGELOG_SECTIONS:
+            line = f"### {section.group(1).capitalize()}"
+        elif line.startswith('### ') and is_english(lang):
+            problems.append(f"'{line[4:]}' is not a Keep a Changelog section ({', '.join(CHANGELOG_SECTIONS)})")
+        fixed.append(line)
+    fixed = drop_empty_sections(fixed, lambda line: line.startswith('### '))
+    if not any(line.startswith('## ') for line in fixed):
+        problems.append("there is no '## [version] - date' heading")
+    return '\n'.join(fixed).strip(), problems
+
+def fix_task_report(text, task_sections=()):
+    """
+    Repairs a markdown issue or quality report locally: bold pseudo-headings
+    become '#' headings, list items use '-' and the items of task_sections
+    become '- [ ]' tasks.
+    """
+    lines = normalize_bullets(strip_code_fences(text).split('\n'))
+    fixed = []
+    in_task_section = False
+    for line in lines:
+        bold = BOLD_HEADING_RE.match(line)
+        if bold:
+            line = f"## {bold.group(1).strip()}"
+        if _is_markdown_heading(line):
+            in_task_section = any(name.lower() in line.lower() for name in task_sections)
+        elif in_task_section and line.startswith('- ') and not TASK_RE.match(line):
+            line = f"- [ ] {line[2:]}"
+        fixed.append(line)
+    fixed = collapse_blank_lines(drop_placeholders(fixed))
+    problems = []
+    if not any(_is_markdown_heading(line) for line in fixed):
+        problems.append("there are no '#' section headings")
+    return '\n'.join(fixed).strip(), problems
+
+def fix_issue(text, lang=None):
+    """Repairs a GitHub issue locally."""
+    return fix_task_report(text, task_sections=('Requirements', 'Acceptance Criteria'))
+
+def fix_quality_report(text, lang=None):
+    """Repairs a quality check report locally."""
+    text, problems = fix_task_report(text)
+    if not re.search(r'^\s*- \[[x ]\]', text, re.MULTILINE):
+        problems.append("the tasks that need to be done are not listed with '- [ ]'")
+    return text, problems
+
+# Command name -> (description used in repair requests, local fixer)
+OUTPUT_FIXERS = {
+    'commit': ('conventional commit message', fix_commit_message),
+    'changelog': ('changelog entry', fix_changelog),
+    'issue': ('GitHub issue', fix_issue),
+    'quality': ('quality check report', fix_quality_report),
+}
+
+def finalize_output(command, text, ai_client, model_alias, timeout=None, repair=True, lang=None, started_at=None):
+    """
+    Validates generated output against the format the command asked for,
+    fixes what it can locally and, only when that is not enough, sends a
+    short repair request that contains the output but not the diff.
+
+    Args:
+        command: The command that generated the output, a key of OUTPUT_FIXERS.
+        text: The generated output.
+        ai_client: The AIClient used for the repair request.
+        model_alias: The model alias used for the repair request.
+        timeout: The command's deadline in seconds.
+        repair: Whether a repair request may be sent.
+        lang: The language the output was requested in.
+        started_at: When the request that generated the output started, as a
+            time.monotonic() value. The repair only gets the time left of that
+            request's deadline.
+
+    Returns:
+        The validated, possibly repaired, output.
+    """
+    if command not in OUTPUT_FIXERS or not text:
+        return text
+    kind, fixer = OUTPUT_FIXERS[command]
+    fixed, problems = fixer(text, lang)
+    if not problems:
+        return fixed
+    if not repair:
+        click.echo(f"Warning: the generated {kind} has problems: {'; '.join(problems)}")
+        return fixed
+
+    if started_at is not None:
+        remaining = ai_client.remaining_time(model_alias, timeout, started_at)
+        if remaining == 0:
+            click.echo(f"Warning: no time left to repair the generated {kind}: {'; '.join(problems)}")
+            return fixed
+        if remaining is not None:
+            timeout = remaining
+
+    click.echo(f"Requesting a repair of the {kind} without the diff: {'; '.join(problems)}")
+    prompt = (repair_prompt.replace('[insert_kind]', kind)
+              .replace('[insert_problems]', '\n'.join(f'- {problem}' for problem in problems))
+              .replace('[insert_output]', fixed))
+    messages = [
+        {"role": "system", "content": repair_system_instruction},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        repaired = ai_client.request(messages=messages, model_alias=model_alias, timeout=timeout,
+                                     command=f'{command}-repair', allow_partial=False)
+    except Exception as e:
+        click.echo(f"Warning: repair request failed: {str(e)}")
+        return fixed
+
+    repaired, remaining = fixer(repaired, lang)
+    # Only a repair that solves every problem without adding new ones replaces the output
+    if remaining or not repaired.strip():
+        click.echo(f"Warning: the repair did not fix the {kind}, keeping the original: {'; '.join(problems)}")
+        return fixed
+    return repaired
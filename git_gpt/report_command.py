@@ -0,0 +1,117 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import click
+from .config_command import get_config
+from .ai_client import AIClient
+from .git_diff import get_diff
+from .diff_pipeline import prepare_diff
+from .output_validation import finalize_output
+from .model_router import select_model, predict_model
+from .issue_command import build_issue_messages
+from .changelog_command import build_changelog_messages
+from .quality_command import build_quality_messages
+
+# Section name -> (message builder, config key for max tokens, title in a combined report)
+REPORT_SECTIONS = {
+    'issue': (build_issue_messages, 'issue_max_tokens', 'Issue'),
+    'changelog': (build_changelog_messages, 'changelog_max_tokens', 'Changelog'),
+    'quality': (build_quality_messages, 'quality_check_max_tokens', 'Quality Check'),
+}
+
+def parse_sections(sections):
+    names = [name.strip() for name in sections.split(',') if name.strip()]
+    unknown = [name for name in names if name not in REPORT_SECTIONS]
+    if unknown:
+        raise click.BadParameter(f"Unknown section(s): {', '.join(unknown)}. Choose from {', '.join(REPORT_SECTIONS)}.")
+    if not names:
+        raise click.BadParameter("At least one section is required.")
+    # Keep the order given by the user but drop duplicates
+    return list(dict.fromkeys(names))
+
+def write_report(results, output):
+    """
+    Writes section results either to a single markdown file (when the output
+    path ends in .md), each section under a heading with its title, or to one
+    <section>.md file per section in a directory.
+    """
+    if output.lower().endswith('.md'):
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as report_file:
+            sections = [f"# {REPORT_SECTIONS[name][2]}\n\n{content}" for name, content in results.items()]
+            report_file.write('\n\n---\n\n'.join(sections) + '\n')
+        return [output]
+
+    os.makedirs(output, exist_ok=True)
+    paths = []
+    for name, content in results.items():
+        path = os.path.join(output, f'{name}.md')
+        with open(path, 'w', encoding='utf-8') as section_file:
+            section_file.write(content + '\n')
+        paths.append(path)
+    return paths
+
+@click.command(help="Generate issue, changelog and quality sections from one diff in parallel.")
+@click.option('--lang', '-l', default=None, help='Target language for the generated report.')
+@click.option('--model', '-m', default=None, help='The model to use for every section.')
+@click.option('--commit-range', '-r', type=int, help='The number of commits to include in the diff.')
+@click.option('--diff-file', type=click.Path(exists=True, dir_okay=False, allow_dash=True), default=None, help='Read the diff from a patch file, or - for stdin, instead of running git.')
+@click.option('--sections', '-s', default=','.join(REPORT_SECTIONS), show_default=True, help='Comma-separated sections to generate.')
+@click.option('--output', '-o', default=None, help='A .md file for a combined report, or a directory for one file per section. Prints to the terminal if omitted.')
+@click.option('--timeout', type=float, default=None, help='Deadline in seconds for each model request (0 disables it).')
+@click.option('--verbose', '-v', is_flag=True, help='Print details such as the model route that was chosen.')
+def report(lang, model, commit_range, diff_file, sections, output, timeout, verbose):
+    config = get_config()
+
+    lang = lang or config.get('lang', 'English')
+    section_names = parse_sections(sections)
+
+    # Connect to the providers while git computes the diff
+    ai_client = AIClient(config, verbose=verbose)
+    for name in section_names:
+        ai_client.warm_up(predict_model(config, name, model), timeout=timeout)
+
+    # Read the diff once and share it between all sections
+    diff = prepare_diff(get_diff(commit_range, diff_file), config)
+    diff_bytes = len(diff.encode('utf-8'))
+    models = {name: select_model(config, name, diff, model, verbose) for name in section_names}
+
+    def generate(name):
+        build_messages, max_tokens_key, _ = REPORT_SECTIONS[name]
+        started_at = time.monotonic()
+        response = ai_client.request(messages=build_messages(diff, lang), model_alias=models[name],
+                                     max_tokens=config.get(max_tokens_key) or None, timeout=timeout,
+                                     command=name, diff_bytes=diff_bytes)
+        return finalize_output(name, response, ai_client, models[name], timeout, config.get('repair_output', True), lang, started_at)
+
+    click.echo(f"Generating {', '.join(section_names)} in {lang} in parallel...")
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=len(section_names))
+    futures = {name: executor.submit(generate, name) for name in section_names}
+    try:
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                click.echo(f"Error generating {name} section: {str(e)}")
+    except KeyboardInterrupt:
+        # Abort the requests still running instead of waiting for their deadlines
+        ai_client.cancel_all()
+        executor.shutdown(wait=False, cancel_futures=True)
+        click.echo("Report cancelled.")
+        raise
+    executor.shutdown()
+
+    if not results:
+        click.echo("No sections were generated.")
+        return
+
+    if output:
+        for path in write_report(results, output):
+            click.echo(f"Wrote {path}")
+        return
+
+    for name, content in results.items():
+        click.echo(f"\n{'=' * 20} {name} {'=' * 20}\n\n{content}")
@@ -0,0 +1,77 @@
+import math
+import re
+import time
+import click
+from .ledger import load_requests, LEDGER_PATH
+
+WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_window(window):
+    """Converts a window such as '30m', '24h' or '7d' into seconds."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*', window or '')
+    if not match:
+        raise click.BadParameter(f"Invalid time window '{window}', use a number followed by s, m, h, d or w (e.g. 7d).")
+    return float(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+# Requests that hit their deadline still ran for their full latency, so they
+# count towards the percentiles instead of being dropped with other errors.
+TIMEOUT_ERROR_CLASSES = ('TimeoutError',)
+
+def summarize(rows):
+    """Aggregates ledger rows into latency and throughput figures."""
+    latencies = [row['latency'] for row in rows
+                 if row['latency'] is not None and (not row['error_class'] or row['error_class'] in TIMEOUT_ERROR_CLASSES)]
+    ttfts = [row['ttft'] for row in rows if row['ttft'] is not None]
+    generated = [row for row in rows if row['completion_tokens'] and row['latency'] and not row['error_class']]
+    generation_time = sum(row['latency'] - (row['ttft'] or 0) for row in generated)
+    cache_known = [row for row in rows if row['cache_hit'] is not None]
+    return {
+        'requests': len(rows),
+        'errors': sum(1 for row in rows if row['error_class']),
+        'timeouts': sum(1 for row in rows if row['error_class'] in TIMEOUT_ERROR_CLASSES),
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'ttft_p50': percentile(ttfts, 50),
+        'tokens_per_second': sum(row['completion_tokens'] for row in generated) / generation_time if generation_time > 0 else None,
+        'cache_hit_rate': sum(row['cache_hit'] for row in cache_known) / len(cache_known) if cache_known else None,
+    }
+
+def _format_seconds(value):
+    return '-' if value is None else f'{value:.2f}s'
+
+@click.command(help="Show latency and throughput of past requests from the local ledger.")
+@click.option('--since', '-s', default='30d', help='Time window to report on, e.g. 24h, 7d or 4w.')
+@click.option('--provider', '-p', default=None, help='Only include requests to this provider.')
+@click.option('--command', '-c', 'command_name', default=None, help='Only include requests made by this command.')
+def stats(since, provider, command_name):
+    window = parse_window(since)
+    rows = load_requests(since=time.time() - window, provider=provider, command=command_name)
+    if not rows:
+        click.echo(f"No requests recorded in the last {since} ({LEDGER_PATH}).")
+        return
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['provider'] or '-', row['command'] or '-'), []).append(row)
+
+    header = f"{'Provider':<20} {'Command':<15} {'Reqs':>5} {'Errs':>5} {'T/O':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'TTFT p50':>9} {'Tok/s':>7} {'Cache':>6}"
+    click.echo(f"Requests in the last {since}:\n")
+    click.echo(header)
+    click.echo('-' * len(header))
+    for (group_provider, group_command), group_rows in sorted(groups.items()):
+        summary = summarize(group_rows)
+        throughput = '-' if summary['tokens_per_second'] is None else f"{summary['tokens_per_second']:.1f}"
+        cache = '-' if summary['cache_hit_rate'] is None else f"{summary['cache_hit_rate']:.0%}"
+        click.echo(
+            f"{group_provider:<20} {group_command:<15} {summary['requests']:>5} {summary['errors']:>5} {summary['timeouts']:>5} "
+            f"{_format_seconds(summary['p50']):>8} {_format_seconds(summary['p95']):>8} {_format_seconds(summary['p99']):>8} "
+            f"{_format_seconds(summary['ttft_p50']):>9} {throughput:>7} {cache:>6}")
@@ -0,0 +1,64 @@
+import os
+import git
+
+def _worktrees(repo):
+    """Returns the working trees linked to a repository, skipping bare entries."""
+    paths = []
+    for block in repo.git.worktree('list', '--porcelain').split('\n\n'):
+        lines = block.strip().splitlines()
+        if not lines or not lines[0].startswith('worktree ') or 'bare' in lines:
+            continue
+        path = lines[0][len('worktree '):]
+        if os.path.isdir(path):
+            paths.append(path)
+    return paths
+
+def _submodules(path):
+    """Returns (submodule path, superproject path) pairs for the initialized submodules of a repository, recursively."""
+    output = git.Repo(path).git.submodule('foreach', '--quiet', '--recursive', 'printf "%s\\t%s\\n" "$PWD" "$toplevel"')
+    pairs = []
+    for line in output.splitlines():
+        if '\t' in line:
+            submodule, superproject = line.split('\t', 1)
+            pairs.append((submodule, superproject))
+    return pairs
+
+def find_repositories(root, submodules=True, worktrees=False):
+    """
+    Discovers the repositories of a workspace.
+
+    Args:
+        root: A path inside the starting repository.
+        submodules: Whether to include initialized submodules, recursively.
+        worktrees: Whether to include the other working trees linked to the
+            starting repository.
+
+    Returns:
+        A dict of {repository path: superproject path or None}, starting with
+        the repository that contains root.
+    """
+    repo = git.Repo(root, search_parent_directories=True)
+    tops = [repo.working_tree_dir]
+    if worktrees:
+        tops.extend(_worktrees(repo))
+
+    repositories = {}
+    for top in tops:
+        repositories.setdefault(os.path.realpath(top), None)
+        if submodules:
+            for submodule, superproject in _submodules(top):
+                repositories.setdefault(os.path.realpath(submodule), os.path.realpath(superproject))
+    return repositories
+
+def superprojects_of(path, repositories):
+    """Returns the superprojects that contain a repository, innermost first."""
+    chain = []
+    parent = repositories.get(path)
+    while parent:
+        chain.append(parent)
+        parent = repositories.get(parent)
+    return chain
+
+def commit_order(paths, repositories):
+    """Orders repositories so that submodules are committed before the superprojects that record them."""
+    return sorted(paths, key=lambda path: len(superprojects_of(path, repositories)), reverse=True)